@@ -26,7 +26,7 @@ setup(
     url="https://github.com/src-d/engine/tree/master/python",
     packages=['sourced.engine'],
     namespace_packages=['sourced'],
-    install_requires=["pyspark==2.2.1","bblfsh==2.9.13"],
+    install_requires=["pyspark==2.2.1","py4j>=0.10.1","bblfsh==2.9.13"],
     classifiers=[
         "Development Status :: 2 - Pre-Alpha",
         "Intended Audience :: Developers",
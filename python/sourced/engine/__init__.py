@@ -1,6 +1,5 @@
 from __future__ import absolute_import
 from importlib import import_module
-from bblfsh.sdkversion import VERSION
 
 from sourced.engine.engine import Engine, SourcedDataFrame
 
@@ -14,6 +13,7 @@ def parse_uast_node(data):
     :type data: byte array
     :rtype: UAST node
     """
+    from bblfsh.sdkversion import VERSION
     return import_module(
         "bblfsh.gopkg.in.bblfsh.sdk.%s.uast.generated_pb2" % VERSION)\
         .Node.FromString(data)
\ No newline at end of file
@@ -1,7 +1,30 @@
 import functools
-from py4j.java_gateway import java_import
+import json
+import weakref
 from pyspark.sql import DataFrame
-from bblfsh.sdkversion import VERSION
+
+# Types of the values accepted as filters of Engine.blobs.
+try:
+    _STRING_TYPES = (basestring,)
+except NameError:
+    _STRING_TYPES = (str,)
+
+# Implicits object from Scala of every gateway.
+_IMPLICITS_CACHE = weakref.WeakKeyDictionary()
+
+
+def _get_implicits(gateway):
+    """
+    Returns the implicits object from Scala for the given gateway. It's a process-wide
+    singleton, so it's resolved only once per gateway. It's resolved by its full name,
+    because the imports of the JVM view are shared with any other library using the
+    gateway and other package objects may be imported as package$ too.
+    """
+    implicits = _IMPLICITS_CACHE.get(gateway)
+    if implicits is None:
+        implicits = getattr(getattr(gateway.jvm.tech.sourced.engine, 'package$'), 'MODULE$')
+        _IMPLICITS_CACHE[gateway] = implicits
+    return implicits
 
 
 class Engine(object):
@@ -25,17 +48,19 @@ class Engine(object):
     :type skip_cleanup: bool
     :param skip_read_errors: skip any error encountered during repository reads
     :type skip_read_errors: bool
+    :param target_partition_bytes: approximate size in bytes of the siva files read in
+    every partition. By default, all the files are packed in very few partitions.
+    :type target_partition_bytes: int
     """
 
-    def __init__(self, session, repos_path, repos_format, skip_cleanup=False, skip_read_errors=False):
+    def __init__(self, session, repos_path, repos_format, skip_cleanup=False, skip_read_errors=False,
+                 target_partition_bytes=None):
         self.session = session
         self.__jsparkSession = session._jsparkSession
         self.session.conf.set('spark.tech.sourced.engine.repositories.path', repos_path)
         self.session.conf.set('spark.tech.sourced.engine.repositories.format', repos_format)
-        self.__jvm = self.session.sparkContext._gateway.jvm
-        java_import(self.__jvm, 'tech.sourced.engine.Engine')
-        java_import(self.__jvm, 'tech.sourced.engine.package$')
-
+        gateway = self.session.sparkContext._gateway
+        self.__jvm = gateway.jvm
         try:
             self.__engine = self.__jvm.tech.sourced.engine.Engine.apply(self.__jsparkSession, repos_path, repos_format)
         except TypeError as e:
@@ -50,7 +75,11 @@ class Engine(object):
         if skip_read_errors:
             self.__engine.skipReadErrors(True)
 
-        self.__implicits = getattr(getattr(self.__jvm.tech.sourced.engine, 'package$'), 'MODULE$')
+        # The option is stored in the session, so it's always written to not keep the
+        # value given to a previous Engine.
+        self.__engine.setTargetPartitionBytes(target_partition_bytes or 0)
+
+        self.__implicits = _get_implicits(gateway)
 
 
     @property
@@ -86,19 +115,23 @@ class Engine(object):
         :param commit_hashes: list of hashes to filter by (optional)
         :type commit_hashes: list of strings
         :rtype: BlobsDataFrame
-        """
-        if not isinstance(repository_ids, list):
-            raise Exception("repository_ids must be a list")
-
-        if not isinstance(reference_names, list):
-            raise Exception("reference_names must be a list")
-
-        if not isinstance(commit_hashes, list):
-            raise Exception("commit_hashes must be a list")
-
-        return BlobsDataFrame(self.__engine.getBlobs(repository_ids,
-                                                  reference_names,
-                                                  commit_hashes),
+        :raise TypeError: when any of the arguments is not a list of strings
+        """
+        for name, val in (("repository_ids", repository_ids),
+                          ("reference_names", reference_names),
+                          ("commit_hashes", commit_hashes)):
+            if type(val) is not list:
+                raise TypeError("%s must be a list, got %s" % (name, type(val).__name__))
+            for item in val:
+                if not isinstance(item, _STRING_TYPES):
+                    raise TypeError("%s must only contain strings, got %s"
+                                    % (name, type(item).__name__))
+
+        # lists are sent as JSON arrays, converting them to Java lists would require
+        # a call to the JVM for every element
+        return BlobsDataFrame(self.__engine.getBlobsFromJson(json.dumps(repository_ids),
+                                                             json.dumps(reference_names),
+                                                             json.dumps(commit_hashes)),
                               self.session,
                               self.__implicits)
 
@@ -163,82 +196,144 @@ class SourcedDataFrame(DataFrame):
     :type implicits: py4j.java_gateway.JavaObject
     """
 
+    # DataFrame does not define __slots__, so instances still have a __dict__ for its
+    # attributes, but the ones of the engine are stored in slots.
+    __slots__ = ('_session', '_implicits', '_base_jdf', '_pending_steps')
+
     def __init__(self, jdf, session, implicits):
+        self._pending_steps = []
         DataFrame.__init__(self, jdf, session)
         self._session = session
         self._implicits = implicits
 
 
     @property
-    def _engine_dataframe(self):
-        return self._implicits.EngineDataFrame(self._jdf)
+    def _jdf(self):
+        """
+        Java DataFrame with all the pending steps applied. The pending steps are
+        sent to the JVM in a single call the first time the Java DataFrame is needed.
+        """
+        if self._pending_steps:
+            self._base_jdf = self._run_pipeline(self._pending_steps)
+            self._pending_steps = []
+        return self._base_jdf
+
+
+    @_jdf.setter
+    def _jdf(self, jdf):
+        self._base_jdf = jdf
+
+
+    def _related(self, name, cls):
+        """
+        Returns the DataFrame related to this one with the given name as an instance
+        of the given class.
+        """
+        return cls(self._implicits.getRelated(self._jdf, name), self._session, self._implicits)
+
+
+    def _run_pipeline(self, steps):
+        return self._implicits.runPipeline(self._base_jdf, json.dumps(steps))
+
+
+    def _defer(self, cls, step):
+        """
+        Returns a new DataFrame of the given class with the given step queued, without
+        calling the JVM. If this DataFrame has pending steps, they are applied first, so
+        the new DataFrame is built on top of the Java DataFrame of this one and can reuse
+        it if it's cached. Use pipeline to apply many steps with a single call.
+        """
+        dataframe = cls(self._jdf, self._session, self._implicits)
+        dataframe._pending_steps = [step]
+        return dataframe
+
+
+    def pipeline(self, steps):
+        """
+        Applies all the given steps to the current DataFrame with a single call to
+        the JVM. Each step is a dict with the name of the operation in the "op" key
+        and its arguments. The supported operations are "classifyLanguages",
+        "extractUASTs", "classifyAndExtract", "queryUAST" (with "query", "queryColumn"
+        and "outputColumn"), "queryUASTs" (with "queries", "queryColumn" and
+        "outputPrefix") and "extractTokens" (with "queryColumn" and "outputColumn").
+
+        >>> tokens_df = blobs_df.pipeline([{"op": "extractUASTs"},
+        ...                                {"op": "queryUAST", "query": "//*[@roleIdentifier]"},
+        ...                                {"op": "extractTokens"}])
+
+        :param steps: steps to apply
+        :type steps: list of dicts
+        :rtype: SourcedDataFrame
+        """
+        steps = list(steps)
+        if not steps:
+            return self
+
+        result_types = {
+            "classifyLanguages": BlobsWithLanguageDataFrame,
+            "extractUASTs": UASTsDataFrame,
+            "classifyAndExtract": UASTsDataFrame,
+            "queryUAST": UASTsDataFrame,
+            "queryUASTs": UASTsDataFrame,
+            "extractTokens": UASTsDataFrame,
+        }
+        op = steps[-1].get("op")
+        if op not in result_types:
+            raise ValueError("unknown pipeline operation: %s" % op)
+
+        return result_types[op](self._run_pipeline(self._pending_steps + steps),
+                                self._session, self._implicits)
 
     def __generate_method(name):
         """
         Wraps the DataFrame's original method by name to return the derived class instance.
         """
-        try:
-            func = getattr(DataFrame, name)
-        except AttributeError as e:
-            # PySpark version is too old
-            def func(self, *args, **kwargs):
-                raise e
-            return func
-        wraps = getattr(functools, "wraps", lambda _: lambda f: f)  # py3.4+
+        func = getattr(DataFrame, name)
 
-        @wraps(func)
+        @functools.wraps(func)
         def _wrapper(self, *args, **kwargs):
             dataframe = func(self, *args, **kwargs)
-            if self.__class__ != SourcedDataFrame \
-                    and isinstance(self, SourcedDataFrame) \
-                    and isinstance(dataframe, DataFrame):
-                return self.__class__(dataframe._jdf, self._session, self._implicits)
+            if isinstance(dataframe, DataFrame) and type(self) is not SourcedDataFrame:
+                return type(self)(dataframe._jdf, self._session, self._implicits)
             return dataframe
 
         return _wrapper
 
-    # The following code wraps all the methods of DataFrame as of 2.3
-    alias = __generate_method("alias")
-    checkpoint = __generate_method("checkpoint")
-    coalesce = __generate_method("coalesce")
-    crossJoin = __generate_method("crossJoin")
-    crosstab = __generate_method("crosstab")
-    describe = __generate_method("describe")
-    distinct = __generate_method("distinct")
-    dropDuplicates = __generate_method("dropDuplicates")
-    drop_duplicates = dropDuplicates
-    drop = __generate_method("drop")
-    dropna = __generate_method("dropna")
-    fillna = __generate_method("fillna")
-    filter = __generate_method("filter")
-    freqItems = __generate_method("freqItems")
-    hint = __generate_method("hint")
-    intersect = __generate_method("intersect")
-    join = __generate_method("join")
-    limit = __generate_method("limit")
-    randomSplit = __generate_method("randomSplit")
-    repartition = __generate_method("repartition")
-    replace = __generate_method("replace")
-    sampleBy = __generate_method("sampleBy")
-    sample = __generate_method("sample")
-    selectExpr = __generate_method("selectExpr")
-    select = __generate_method("select")
-    sort = __generate_method("sort")
-    orderBy = sort
-    sortWithinPartitions = __generate_method("sortWithinPartitions")
-    subtract = __generate_method("subtract")
-    summary = __generate_method("summary")
-    toDF = __generate_method("toDF")
-    unionByName = __generate_method("unionByName")
-    union = __generate_method("union")
-    where = filter
-    withColumn = __generate_method("withColumn")
-    withColumnRenamed = __generate_method("withColumnRenamed")
-    withWatermark = __generate_method("withWatermark")
-
     __generate_method = staticmethod(__generate_method)  # to make IntelliSense happy
 
 
+# Methods of DataFrame as of 2.3 that are wrapped to return the derived class instance.
+_WRAPPED_NAMES = frozenset([
+    "alias", "checkpoint", "coalesce", "crossJoin", "crosstab", "describe", "distinct",
+    "dropDuplicates", "drop_duplicates", "drop", "dropna", "fillna", "filter", "freqItems",
+    "hint", "intersect", "join", "limit", "randomSplit", "repartition", "replace", "sampleBy",
+    "sample", "selectExpr", "select", "sort", "orderBy", "sortWithinPartitions", "subtract",
+    "summary", "toDF", "unionByName", "union", "where", "withColumn", "withColumnRenamed",
+    "withWatermark",
+])
+
+
+class _WrappedMethod(object):
+    """
+    Descriptor that wraps the DataFrame method with the given name the first time it is
+    accessed and replaces itself with the wrapper in SourcedDataFrame, so the following
+    lookups are plain method lookups.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        wrapper = SourcedDataFrame._SourcedDataFrame__generate_method(self.name)
+        setattr(SourcedDataFrame, self.name, wrapper)
+        return wrapper.__get__(instance, owner)
+
+
+for _name in _WRAPPED_NAMES:
+    setattr(SourcedDataFrame, _name, _WrappedMethod(_name))
+del _name
+
+
 class RepositoriesDataFrame(SourcedDataFrame):
     """
     DataFrame containing repositories.
@@ -253,6 +348,8 @@ class RepositoriesDataFrame(SourcedDataFrame):
     :type implicits: py4j.java_gateway.JavaObject
     """
 
+    __slots__ = ()
+
     def __init__(self, jdf, session, implicits):
         SourcedDataFrame.__init__(self, jdf, session, implicits)
 
@@ -266,8 +363,7 @@ class RepositoriesDataFrame(SourcedDataFrame):
 
         :rtype: ReferencesDataFrame
         """
-        return ReferencesDataFrame(self._engine_dataframe.getReferences(),
-                                   self._session, self._implicits)
+        return self._related("references", ReferencesDataFrame)
 
 
     @property
@@ -280,8 +376,7 @@ class RepositoriesDataFrame(SourcedDataFrame):
 
         :rtype: ReferencesDataFrame
         """
-        return ReferencesDataFrame(self._engine_dataframe.getRemoteReferences(),
-                                   self._session, self._implicits)
+        return self._related("remote_references", ReferencesDataFrame)
 
 
     @property
@@ -293,8 +388,7 @@ class RepositoriesDataFrame(SourcedDataFrame):
 
         :rtype: ReferencesDataFrame
         """
-        return ReferencesDataFrame(self._engine_dataframe.getReferences().getHEAD(),
-                                   self._session, self._implicits)
+        return self._related("head_ref", ReferencesDataFrame)
 
 
     @property
@@ -306,8 +400,7 @@ class RepositoriesDataFrame(SourcedDataFrame):
 
         :rtype: ReferencesDataFrame
         """
-        return ReferencesDataFrame(self._engine_dataframe.getReferences().getHEAD(),
-                                   self._session, self._implicits)
+        return self._related("master_ref", ReferencesDataFrame)
 
 
 class ReferencesDataFrame(SourcedDataFrame):
@@ -324,6 +417,8 @@ class ReferencesDataFrame(SourcedDataFrame):
     :type implicits: py4j.java_gateway.JavaObject
     """
 
+    __slots__ = ()
+
     def __init__(self, jdf, session, implicits):
         SourcedDataFrame.__init__(self, jdf, session, implicits)
 
@@ -338,8 +433,7 @@ class ReferencesDataFrame(SourcedDataFrame):
 
         :rtype: ReferencesDataFrame
         """
-        return ReferencesDataFrame(self._engine_dataframe.getRemoteReferences(),
-                                   self._session, self._implicits)
+        return self._related("remote_references", ReferencesDataFrame)
 
 
     @property
@@ -351,8 +445,7 @@ class ReferencesDataFrame(SourcedDataFrame):
 
         :rtype: ReferencesDataFrame
         """
-        return ReferencesDataFrame(self._engine_dataframe.getHEAD(),
-                                   self._session, self._implicits)
+        return self._related("head_ref", ReferencesDataFrame)
 
 
     @property
@@ -364,9 +457,7 @@ class ReferencesDataFrame(SourcedDataFrame):
 
         :rtype: ReferencesDataFrame
         """
-        return ReferencesDataFrame(self._engine_dataframe.getMaster(),
-                                   self._session, self._implicits)
-        return self.ref('refs/heads/master')
+        return self._related("master_ref", ReferencesDataFrame)
 
 
     def ref(self, ref):
@@ -380,7 +471,7 @@ class ReferencesDataFrame(SourcedDataFrame):
         :type ref: str
         :rtype: ReferencesDataFrame
         """
-        return ReferencesDataFrame(self.filter(self.name == ref)._jdf,
+        return ReferencesDataFrame(self._implicits.getReference(self._jdf, ref),
                                    self._session, self._implicits)
 
 
@@ -401,7 +492,7 @@ class ReferencesDataFrame(SourcedDataFrame):
 
         :rtype: CommitsDataFrame
         """
-        return CommitsDataFrame(self._engine_dataframe.getAllReferenceCommits(), self._session, self._implicits)
+        return self._related("all_reference_commits", CommitsDataFrame)
 
 
     @property
@@ -420,7 +511,7 @@ class ReferencesDataFrame(SourcedDataFrame):
 
         :rtype: CommitsDataFrame
         """
-        return CommitsDataFrame(self._engine_dataframe.getCommits(), self._session, self._implicits)
+        return self._related("commits", CommitsDataFrame)
 
 
     @property
@@ -432,7 +523,7 @@ class ReferencesDataFrame(SourcedDataFrame):
 
         :rtype: BlobsDataFrame
         """
-        return BlobsDataFrame(self._engine_dataframe.getBlobs(), self._session, self._implicits)
+        return self._related("blobs", BlobsDataFrame)
 
 
 class CommitsDataFrame(SourcedDataFrame):
@@ -449,6 +540,8 @@ class CommitsDataFrame(SourcedDataFrame):
     :type implicits: py4j.java_gateway.JavaObject
     """
 
+    __slots__ = ()
+
     def __init__(self, jdf, session, implicits):
         SourcedDataFrame.__init__(self, jdf, session, implicits)
 
@@ -469,7 +562,7 @@ class CommitsDataFrame(SourcedDataFrame):
 
         :rtype: CommitsDataFrame
         """
-        return CommitsDataFrame(self._engine_dataframe.getAllReferenceCommits(), self._session, self._implicits)
+        return self._related("all_reference_commits", CommitsDataFrame)
 
 
     @property
@@ -481,7 +574,7 @@ class CommitsDataFrame(SourcedDataFrame):
 
         :rtype: TreeEntriesDataFrame
         """
-        return TreeEntriesDataFrame(self._engine_dataframe.getTreeEntries(), self._session, self._implicits)
+        return self._related("tree_entries", TreeEntriesDataFrame)
 
 
     @property
@@ -493,8 +586,7 @@ class CommitsDataFrame(SourcedDataFrame):
 
         :rtype: BlobsDataFrame
         """
-        return BlobsDataFrame(self._engine_dataframe.getBlobs(), self._session,
-                                self._implicits)
+        return self._related("blobs", BlobsDataFrame)
 
 
 class TreeEntriesDataFrame(SourcedDataFrame):
@@ -511,6 +603,8 @@ class TreeEntriesDataFrame(SourcedDataFrame):
     :type implicits: py4j.java_gateway.JavaObject
     """
 
+    __slots__ = ()
+
     def __init__(self, jdf, session, implicits):
         SourcedDataFrame.__init__(self, jdf, session, implicits)
 
@@ -524,8 +618,7 @@ class TreeEntriesDataFrame(SourcedDataFrame):
 
         :rtype: BlobsDataFrame
         """
-        return BlobsDataFrame(self._engine_dataframe.getBlobs(), self._session,
-                              self._implicits)
+        return self._related("blobs", BlobsDataFrame)
 
 
 class BlobsDataFrame(SourcedDataFrame):
@@ -542,6 +635,8 @@ class BlobsDataFrame(SourcedDataFrame):
     :type implicits: py4j.java_gateway.JavaObject
     """
 
+    __slots__ = ()
+
     def __init__(self, jdf, session, implicits):
         SourcedDataFrame.__init__(self, jdf, session, implicits)
 
@@ -555,8 +650,7 @@ class BlobsDataFrame(SourcedDataFrame):
 
         :rtype: BlobsWithLanguageDataFrame
         """
-        return BlobsWithLanguageDataFrame(self._engine_dataframe.classifyLanguages(),
-                                          self._session, self._implicits)
+        return self._defer(BlobsWithLanguageDataFrame, {"op": "classifyLanguages"})
 
 
     def extract_uasts(self):
@@ -568,8 +662,20 @@ class BlobsDataFrame(SourcedDataFrame):
 
         :rtype: UASTsDataFrame
         """
-        return UASTsDataFrame(self._engine_dataframe.extractUASTs(),
-                              self._session, self._implicits)
+        return self._defer(UASTsDataFrame, {"op": "extractUASTs"})
+
+
+    def classify_and_extract(self):
+        """
+        Returns a new DataFrame with the language and the parsed UAST data of any
+        blob added to its row. It's the same as calling classify_languages and then
+        extract_uasts, but the content of every blob is only read once.
+
+        >>> uasts_df = blobs_df.classify_and_extract()
+
+        :rtype: UASTsDataFrame
+        """
+        return self._defer(UASTsDataFrame, {"op": "classifyAndExtract"})
 
 
 class BlobsWithLanguageDataFrame(SourcedDataFrame):
@@ -586,6 +692,8 @@ class BlobsWithLanguageDataFrame(SourcedDataFrame):
     :type implicits: py4j.java_gateway.JavaObject
     """
 
+    __slots__ = ()
+
     def __init__(self, jdf, session, implicits):
         SourcedDataFrame.__init__(self, jdf, session, implicits)
 
@@ -599,8 +707,7 @@ class BlobsWithLanguageDataFrame(SourcedDataFrame):
 
         :rtype: UASTsDataFrame
         """
-        return UASTsDataFrame(self._engine_dataframe.extractUASTs(),
-                              self._session, self._implicits)
+        return self._defer(UASTsDataFrame, {"op": "extractUASTs"})
 
 
 class UASTsDataFrame(SourcedDataFrame):
@@ -617,6 +724,8 @@ class UASTsDataFrame(SourcedDataFrame):
     :type implicits: py4j.java_gateway.JavaObject
     """
 
+    __slots__ = ()
+
     def __init__(self, jdf, session, implicits):
         SourcedDataFrame.__init__(self, jdf, session, implicits)
 
@@ -636,10 +745,34 @@ class UASTsDataFrame(SourcedDataFrame):
         :type output_col: str
         :rtype: UASTsDataFrame
         """
-        return UASTsDataFrame(self._engine_dataframe.queryUAST(query,
-                                       query_col,
-                                       output_col),
-                              self._session, self._implicits)
+        return self._defer(UASTsDataFrame, {"op": "queryUAST",
+                                            "query": query,
+                                            "queryColumn": query_col,
+                                            "outputColumn": output_col})
+
+
+    def query_uasts_batch(self, queries, query_col='uast', output_prefix='result'):
+        """
+        Queries the UAST of a file with all the given queries at once to get specific
+        nodes. The UAST is only parsed once for all the queries and the result of each
+        query is placed in a column named after the output prefix and the position of
+        the query.
+
+        >>> rows = uasts_df.query_uasts_batch(['//*[@roleIdentifier]', '//*[@roleFunction]']).collect()
+        >>> identifiers, functions = rows[0]['result_0'], rows[0]['result_1']
+
+        :param queries: xpath queries
+        :type queries: list of str
+        :param query_col: column containing the list of nodes to query
+        :type query_col: str
+        :param output_prefix: prefix of the columns to place the results of the queries
+        :type output_prefix: str
+        :rtype: UASTsDataFrame
+        """
+        return self._defer(UASTsDataFrame, {"op": "queryUASTs",
+                                            "queries": list(queries),
+                                            "queryColumn": query_col,
+                                            "outputPrefix": output_prefix})
 
 
     def extract_tokens(self, input_col='result', output_col='tokens'):
@@ -655,5 +788,6 @@ class UASTsDataFrame(SourcedDataFrame):
         :type output_col: str
         :rtype: UASTsDataFrame
         """
-        return UASTsDataFrame(self._engine_dataframe.extractTokens(input_col, output_col),
-                              self._session, self._implicits)
+        return self._defer(UASTsDataFrame, {"op": "extractTokens",
+                                            "queryColumn": input_col,
+                                            "outputColumn": output_col})
@@ -42,6 +42,16 @@ class EngineTestCase(BaseTestCase):
         self.assertEqual(ids, REPOSITORIES)
 
 
+    def test_target_partition_bytes(self):
+        key = 'spark.tech.sourced.engine.repositories.partition.bytes'
+        repos_path = self.session.conf.get('spark.tech.sourced.engine.repositories.path')
+        Engine(self.session, repos_path, 'siva', target_partition_bytes=1)
+        self.assertEqual(self.session.conf.get(key), '1')
+
+        Engine(self.session, repos_path, 'siva')
+        self.assertEqual(self.session.conf.get(key), '0')
+
+
     def test_references(self):
         df = self.engine.repositories.references
         refs = df.select(df.name).distinct().collect()
@@ -68,6 +78,13 @@ class EngineTestCase(BaseTestCase):
                                   'fff7062de8474d10a67d417ccea87ba6f58ca81d'])
 
 
+    def test_repositories_master(self):
+        df = self.engine.repositories.master_ref
+        names = [r.name for r in df.select(df.name).distinct().collect()]
+        self.assertEqual(names, ['refs/heads/master'])
+        self.assertEqual(df.count(), 5)
+
+
     def test_references_ref(self):
         df = self.engine.repositories.references.ref('refs/heads/develop')
         self.assertEqual(len(df.collect()), 2)
@@ -143,6 +160,15 @@ class EngineTestCase(BaseTestCase):
         self.assertTrue(len(row.uast) > 0)
 
 
+    def test_classify_and_extract(self):
+        df = self.engine.repositories.references.all_reference_commits.tree_entries.blobs
+        row = df.sort(df.blob_id).limit(1).classify_and_extract().first()
+        self.assertEqual(row.blob_id, "0020a823b6e5b06c9adb7def76ccd7ed098a06b8")
+        self.assertEqual(row.path, 'spec/database_spec.rb')
+        self.assertEqual(row.lang, "Ruby")
+        self.assertTrue(len(row.uast) > 0)
+
+
     def test_engine_blobs(self):
         rows = self.engine.repositories.references.head_ref.all_reference_commits.sort('hash').limit(10).collect()
         repos = []
@@ -174,6 +200,21 @@ class EngineTestCase(BaseTestCase):
         self.assertEqual(blobs.count(), 2)
 
 
+    def test_engine_blobs_invalid_args(self):
+        with self.assertRaises(TypeError):
+            self.engine.blobs(repository_ids='github.com/xiyou-linuxer/faq-xiyoulinux')
+
+        with self.assertRaises(TypeError):
+            self.engine.blobs(commit_hashes=('fff7062de8474d10a67d417ccea87ba6f58ca81d',))
+
+        with self.assertRaises(TypeError):
+            self.engine.blobs(commit_hashes=[None])
+
+
+    def test_engine_blobs_empty_value(self):
+        self.assertEqual(self.engine.blobs(repository_ids=['']).count(), 0)
+
+
     def test_uast_query(self):
         df = self.session.createDataFrame(PYTHON_FILES, FILE_COLUMNS)
         repos = self.engine.repositories
@@ -209,6 +250,21 @@ class EngineTestCase(BaseTestCase):
         self.assertCountEqual(idents, ["contents", "read", "f", "open", "f"])
 
 
+    def test_uast_query_batch(self):
+        df = self.session.createDataFrame(PYTHON_FILES, FILE_COLUMNS)
+        repos = self.engine.repositories
+        df = BlobsDataFrame(df._jdf, repos._session, repos._implicits)
+        rows = df.extract_uasts()\
+            .query_uasts_batch(['//*[@roleIdentifier and not(@roleIncomplete)]',
+                                '//*[@roleIdentifier]'])\
+            .collect()
+        self.assertEqual(len(rows), 1)
+
+        idents = [parse_uast_node(node).token for node in rows[0]["result_0"]]
+        self.assertCountEqual(idents, ["contents", "read", "f", "open", "f"])
+        self.assertTrue(len(rows[0]["result_1"]) >= len(idents))
+
+
     def test_extract_tokens(self):
         df = self.session.createDataFrame(PYTHON_FILES, FILE_COLUMNS)
         repos = self.engine.repositories
@@ -218,6 +274,17 @@ class EngineTestCase(BaseTestCase):
 
         self.assertCountEqual(row["tokens"], ["contents", "read", "f", "open", "f"])
 
+    def test_pipeline(self):
+        df = self.session.createDataFrame(PYTHON_FILES, FILE_COLUMNS)
+        repos = self.engine.repositories
+        df = BlobsDataFrame(df._jdf, repos._session, repos._implicits)
+        row = df.pipeline([{"op": "extractUASTs"},
+                           {"op": "queryUAST",
+                            "query": "//*[@roleIdentifier and not(@roleIncomplete)]"},
+                           {"op": "extractTokens"}]).first()
+
+        self.assertCountEqual(row["tokens"], ["contents", "read", "f", "open", "f"])
+
     def test_metadata(self):
         tmpdir = tempfile.mkdtemp()
 
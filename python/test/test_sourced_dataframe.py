@@ -1,7 +1,22 @@
+import json
 from sourced.engine import SourcedDataFrame
+from sourced.engine.engine import BlobsDataFrame
 from .base import BaseTestCase
 
 
+class RecordingImplicits(object):
+    """
+    Implicits that record the pipelines sent to the JVM and return the same DataFrame.
+    """
+
+    def __init__(self):
+        self.pipelines = []
+
+    def runPipeline(self, jdf, steps):
+        self.pipelines.append([step["op"] for step in json.loads(steps)])
+        return jdf
+
+
 class SourcedDataFrameTestCase(BaseTestCase):
     def setUp(self):
         BaseTestCase.setUp(self)
@@ -18,6 +33,32 @@ class SourcedDataFrameTestCase(BaseTestCase):
                           ['Alice', 'Cole', 'Amy', 'Aaron', 'Sue'])
 
 
+    def test_deferred_steps(self):
+        implicits = RecordingImplicits()
+        blobs = BlobsDataFrame(self.df._jdf, self.session, implicits)
+
+        uasts = blobs.extract_uasts()
+        self.assertEqual(implicits.pipelines, [])
+
+        uasts.query_uast('//*[@roleIdentifier]')
+        uasts.query_uast('//*[@roleFunction]')
+        self.assertEqual(implicits.pipelines, [["extractUASTs"]])
+
+        uasts.query_uast('//*[@roleIdentifier]').extract_tokens().count()
+        self.assertEqual(implicits.pipelines,
+                         [["extractUASTs"], ["queryUAST"], ["extractTokens"]])
+
+
+    def test_pipeline_single_call(self):
+        implicits = RecordingImplicits()
+        blobs = BlobsDataFrame(self.df._jdf, self.session, implicits)
+
+        blobs.pipeline([{"op": "extractUASTs"},
+                        {"op": "queryUAST", "query": "//*[@roleIdentifier]"},
+                        {"op": "extractTokens"}])
+        self.assertEqual(implicits.pipelines, [["extractUASTs", "queryUAST", "extractTokens"]])
+
+
     def assert_names(self, df, names):
         result = [r[0] for r in df.select(df[0]).collect()]
         self.assertEqual(result, names)
\ No newline at end of file
@@ -79,7 +79,8 @@ case class GitRelation(session: SparkSession,
   override def buildScan(requiredColumns: Seq[Attribute],
                          filters: Seq[Expression]): RDD[Row] = {
     val sc = session.sparkContext
-    val reposRDD = RepositoryRDDProvider(sc).get(path, repositoriesFormat)
+    val targetPartitionBytes = session.conf.get(TargetPartitionBytesKey, default = "0").toLong
+    val reposRDD = RepositoryRDDProvider(sc).get(path, repositoriesFormat, targetPartitionBytes)
 
     val requiredCols = sc.broadcast(requiredColumns.map(_.name).toArray)
     val reposLocalPath = sc.broadcast(localPath)
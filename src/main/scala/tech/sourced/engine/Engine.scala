@@ -8,11 +8,11 @@ import org.apache.spark.SparkException
 import org.apache.spark.groupon.metrics.UserMetricsSystem
 import org.apache.spark.internal.Logging
 import org.apache.spark.sql.{DataFrame, SaveMode, SparkSession}
+import org.json4s.{JArray, JString, string2JsonInput}
+import org.json4s.jackson.JsonMethods.parse
 import tech.sourced.engine.rule._
 import tech.sourced.engine.udf.ConcatArrayUDF
 
-import scala.collection.JavaConversions.asScalaBuffer
-
 /**
   * Engine is the main entry point to all usage of the source{d} spark-engine.
   * It has methods to configure all possible configurable options as well as
@@ -162,16 +162,25 @@ class Engine(val session: SparkSession,
   }
 
   /**
-    * This method is only offered for easier usage from Python.
+    * This method is only offered for easier usage from Python. Each argument is a JSON
+    * array of strings, so the lists can be sent from Python in a single string instead
+    * of being converted element by element.
+    *
+    * @throws SparkException if any argument is not a JSON array of strings
     */
-  private[engine] def getBlobs(repositoryIds: java.util.List[String],
-                               referenceNames: java.util.List[String],
-                               commitHashes: java.util.List[String]): DataFrame =
-    getBlobs(
-      asScalaBuffer(repositoryIds),
-      asScalaBuffer(referenceNames),
-      asScalaBuffer(commitHashes)
-    )
+  private[engine] def getBlobsFromJson(repositoryIds: String,
+                                       referenceNames: String,
+                                       commitHashes: String): DataFrame = {
+    def values(json: String): Seq[String] = parse(json) match {
+      case JArray(items) => items.map {
+        case JString(value) => value
+        case _ => throw new SparkException(s"expecting a JSON array of strings: $json")
+      }
+      case _ => throw new SparkException(s"expecting a JSON array of strings: $json")
+    }
+
+    getBlobs(values(repositoryIds), values(referenceNames), values(commitHashes))
+  }
 
   /**
     * Sets the path where the siva files of the repositories are stored.
@@ -248,6 +257,24 @@ class Engine(val session: SparkSession,
     this
   }
 
+  /**
+    * Configures the Engine so the siva files are read in partitions of about the given
+    * size in bytes, instead of packing all of them in very few partitions. Siva files
+    * can not be split, so bigger files will still be read in a single partition.
+    * Use a non-positive value to go back to the default partitioning.
+    *
+    * {{{
+    * engine.setTargetPartitionBytes(128 * 1024 * 1024)
+    * }}}
+    *
+    * @param bytes approximate size in bytes of siva files per partition
+    * @return instance of the engine
+    */
+  def setTargetPartitionBytes(bytes: Long): Engine = {
+    session.conf.set(TargetPartitionBytesKey, bytes)
+    this
+  }
+
   /**
     * Saves all the metadata in a SQLite database on the given path as "engine_metadata.db".
     * If the database already exists, it will be overwritten. The given path must exist and
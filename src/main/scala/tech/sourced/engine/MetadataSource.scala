@@ -80,7 +80,8 @@ case class MetadataRelation(session: SparkSession,
     val (qb, shouldGetBlobs) = getQueryBuilder(requiredColumns, filters)
     val metadataCols = sc.broadcast(qb.fields)
     val sql = sc.broadcast(qb.sql)
-    val reposRDD = RepositoryRDDProvider(sc).get(path, repositoriesFormat)
+    val targetPartitionBytes = session.conf.get(TargetPartitionBytesKey, default = "0").toLong
+    val reposRDD = RepositoryRDDProvider(sc).get(path, repositoriesFormat, targetPartitionBytes)
 
     val metadataRDD = sc.emptyRDD[Unit]
       .repartition(session.currentActiveExecutors())
@@ -181,6 +181,10 @@ private[engine] object QueryBuilder {
         } else {
           s"${qualify(attr)} IN (${compileValue(literals)})"
         }
+      case InSet(attr: AttributeReference, values) if values.isEmpty =>
+        s"CASE WHEN ${qualify(attr)} IS NULL THEN NULL ELSE FALSE END"
+      case InSet(attr: AttributeReference, values) =>
+        s"${qualify(attr)} IN (${compileValue(values.toSeq)})"
       case Not(f) => compileFilter(f).map(p => s"(NOT ($p))").orNull
       case Or(f1, f2) =>
         // We can't compile Or filter unless both sub-filters are compiled successfully.
@@ -6,6 +6,8 @@ import org.apache.spark.api.java.function.MapFunction
 import org.apache.spark.sql.functions._
 import org.apache.spark.sql._
 import org.apache.spark.sql.catalyst.encoders.RowEncoder
+import org.json4s.{JArray, JString, string2JsonInput}
+import org.json4s.jackson.JsonMethods.parse
 import tech.sourced.engine.udf._
 import tech.sourced.engine.util.Bblfsh
 
@@ -56,6 +58,13 @@ package object engine {
     */
   private[engine] val SkipReadErrorsKey = "spark.tech.sourced.engine.skip.read.errors"
 
+  /**
+    * Key used for the option to specify the approximate size in bytes of the siva files
+    * read in every partition.
+    */
+  private[engine] val TargetPartitionBytesKey =
+    "spark.tech.sourced.engine.repositories.partition.bytes"
+
   // DataSource names
   val DefaultSourceName: String = "tech.sourced.engine"
   val MetadataSourceName: String = "tech.sourced.engine.MetadataSource"
@@ -322,6 +331,34 @@ package object engine {
       }
     }
 
+    /**
+      * Returns the [[org.apache.spark.sql.DataFrame]] related to the current one with the
+      * given name. This is mostly offered for easier usage from Python, so all relations
+      * can be obtained with the same method.
+      *
+      * Available names are "references", "remote_references", "commits",
+      * "all_reference_commits", "tree_entries", "blobs", "head_ref" and "master_ref".
+      *
+      * {{{
+      * val blobsDf = commitsDf.getRelated("blobs") // same as commitsDf.getBlobs
+      * }}}
+      *
+      * @param name name of the relation
+      * @return new DataFrame with the related data
+      * @throws SparkException if there is no relation with the given name
+      */
+    def getRelated(name: String): DataFrame = name match {
+      case ReferencesTable => getReferences
+      case "remote_references" => getRemoteReferences
+      case CommitsTable => getCommits
+      case "all_reference_commits" => getAllReferenceCommits
+      case TreeEntriesTable => getTreeEntries
+      case BlobsTable => getBlobs
+      case "head_ref" => getHEAD
+      case "master_ref" => getMaster
+      case _ => throw new SparkException(s"unknown related DataFrame: $name")
+    }
+
     /**
       * Returns a new [[org.apache.spark.sql.DataFrame]] with a new column "lang" added
       * containing the language of the non-binary files.
@@ -372,7 +409,7 @@ package object engine {
       */
     def extractUASTs(): DataFrame = {
       val newDf = df.withColumn("uast", typedLit(Seq[Array[Byte]]()))
-      val configB = df.sparkSession.sparkContext.broadcast(Bblfsh.getConfig(df.sparkSession))
+      val configB = Bblfsh.getConfigBroadcast(df.sparkSession)
       val encoder = RowEncoder(newDf.schema)
       newDf.map(new MapFunction[Row, Row] {
         override def call(row: Row): Row = {
@@ -398,6 +435,47 @@ package object engine {
       }, encoder)
     }
 
+    /**
+      * Returns a new [[org.apache.spark.sql.DataFrame]] with the "lang" and "uast" columns
+      * added. It's the same as `classifyLanguages.extractUASTs()`, but both steps are done
+      * with a single pass over the rows, so the content of every file is only read once and
+      * the guessed language is given to bblfsh directly.
+      * It requires the current dataframe to have the files data.
+      *
+      * {{{
+      * val uastsDf = filesDf.classifyAndExtract
+      * }}}
+      *
+      * @return new DataFrame containing language data and Protobuf serialized UAST.
+      */
+    def classifyAndExtract: DataFrame = {
+      val newDf = df.withColumn("lang", typedLit(null: String))
+        .withColumn("uast", typedLit(Seq[Array[Byte]]()))
+      val configB = Bblfsh.getConfigBroadcast(df.sparkSession)
+      val encoder = RowEncoder(newDf.schema)
+      newDf.map(new MapFunction[Row, Row] {
+        override def call(row: Row): Row = {
+          val (isBinaryIdx, pathIdx, contentIdx) = try {
+            (row.fieldIndex("is_binary"), row.fieldIndex("path"), row.fieldIndex("content"))
+          } catch {
+            case _: IllegalArgumentException =>
+              throw new SparkException(s"classifyAndExtract can not be applied to this DataFrame: "
+                + "unable to find all these columns: is_binary, path, content")
+          }
+
+          val (isBinary, path, content) = (
+            row.getBoolean(isBinaryIdx),
+            row.getString(pathIdx),
+            row.getAs[Array[Byte]](contentIdx)
+          )
+
+          val lang = ClassifyLanguagesUDF.getLanguage(isBinary, path, content).orNull
+          val uast = ExtractUASTsUDF.extractUASTs(path, content, lang, configB.value)
+          Row(row.toSeq.dropRight(2) ++ Seq(lang, uast): _*)
+        }
+      }, encoder)
+    }
+
     /**
       * Queries a list of UAST nodes with the given query to get specific nodes,
       * and puts the result in another column.
@@ -440,6 +518,43 @@ package object engine {
       df.withColumn(outputColumn, QueryXPathUDF(df.sparkSession)(df(queryColumn), lit(query)))
     }
 
+    /**
+      * Queries a list of UAST nodes with all the given queries at once, parsing the nodes
+      * only once per row, and puts the result of every query in its own column, named
+      * after the output prefix and the position of the query.
+      *
+      * {{{
+      * // "result_0" will contain identifiers and "result_1" functions
+      * val resultsDf = uastsDf.queryUASTs(Seq("//\*[@roleIdentifier]", "//\*[@roleFunction]"))
+      * }}}
+      *
+      * @param queries      xpath queries
+      * @param queryColumn  column where the list of UAST nodes to query are
+      * @param outputPrefix prefix of the columns where the results of the queries will be placed
+      * @return [[DataFrame]] with a column for the result of every query
+      */
+    def queryUASTs(queries: Seq[String],
+                   queryColumn: String = "uast",
+                   outputPrefix: String = "result"): DataFrame = {
+      checkCols(df, "uast", queryColumn)
+      val outputColumns = queries.indices.map(i => s"${outputPrefix}_$i")
+      outputColumns.find(df.columns.contains).foreach(column =>
+        throw new SparkException(s"DataFrame already contains a column named $column"))
+
+      val queryIdx = df.schema.fieldIndex(queryColumn)
+      val newDf = outputColumns.foldLeft(df)((current, column) =>
+        current.withColumn(column, typedLit(null: Seq[Array[Byte]])))
+      val configB = Bblfsh.getConfigBroadcast(df.sparkSession)
+      val encoder = RowEncoder(newDf.schema)
+      newDf.map(new MapFunction[Row, Row] {
+        override def call(row: Row): Row = {
+          val nodes = row.getAs[Seq[Array[Byte]]](queryIdx)
+          val results = QueryXPathUDF.queryXPaths(nodes, queries, configB.value)
+          Row(row.toSeq.dropRight(queries.length) ++ results: _*)
+        }
+      }, encoder)
+    }
+
     /**
       * Extracts the tokens in all nodes of a given column and puts the list of retrieved
       * tokens in a new column.
@@ -463,8 +578,108 @@ package object engine {
       df.withColumn(outputColumn, ExtractTokensUDF()(df(queryColumn)))
     }
 
+    /**
+      * Applies a list of steps described by the given JSON document to the current
+      * [[org.apache.spark.sql.DataFrame]], chaining them in a single call. This is mostly
+      * offered for easier (and cheaper) usage from Python, which can send the whole
+      * pipeline at once instead of doing a call per step.
+      *
+      * Every step is an object with an "op" key and the arguments of the operation.
+      * Supported operations are "classifyLanguages", "extractUASTs", "classifyAndExtract",
+      * "queryUAST" ("query", "queryColumn", "outputColumn"), "queryUASTs" ("queries",
+      * "queryColumn", "outputPrefix") and "extractTokens" ("queryColumn", "outputColumn").
+      * Omitted arguments take the default value of the method.
+      *
+      * {{{
+      * val tokensDf = blobsDf.runPipeline("""[
+      *   {"op": "extractUASTs"},
+      *   {"op": "queryUAST", "query": "//\*[@roleIdentifier]"},
+      *   {"op": "extractTokens"}
+      * ]""")
+      * }}}
+      *
+      * @param stepsJson JSON array with the steps to apply
+      * @return new DataFrame with all the steps applied
+      * @throws SparkException if the document is not valid or contains an unknown operation
+      */
+    def runPipeline(stepsJson: String): DataFrame = {
+      val steps = parse(stepsJson) match {
+        case JArray(values) => values
+        case _ => throw new SparkException(s"pipeline steps must be a JSON array: $stepsJson")
+      }
+
+      steps.foldLeft(df)((current, step) => {
+        def arg(name: String, default: String): String = step \ name match {
+          case JString(value) => value
+          case _ => default
+        }
+
+        arg("op", null) match {
+          case "classifyLanguages" => current.classifyLanguages
+          case "extractUASTs" => current.extractUASTs()
+          case "classifyAndExtract" => current.classifyAndExtract
+          case "queryUAST" =>
+            val query = arg("query", null)
+            if (query == null) {
+              throw new SparkException("queryUAST pipeline step requires a query")
+            }
+
+            current.queryUAST(query, arg("queryColumn", "uast"), arg("outputColumn", "result"))
+          case "queryUASTs" =>
+            val queries = step \ "queries" match {
+              case JArray(values) => values.map {
+                case JString(query) => query
+                case _ => throw new SparkException("queryUASTs pipeline queries must be strings")
+              }
+              case _ => throw new SparkException("queryUASTs pipeline step requires queries")
+            }
+
+            current.queryUASTs(queries, arg("queryColumn", "uast"), arg("outputPrefix", "result"))
+          case "extractTokens" =>
+            current.extractTokens(arg("queryColumn", "result"), arg("outputColumn", "tokens"))
+          case op => throw new SparkException(s"unknown pipeline operation: $op")
+        }
+      })
+    }
+
   }
 
+  /**
+    * Same as [[EngineDataFrame#getRelated]], but without wrapping the DataFrame first.
+    * This is only offered for easier usage from Python, where the implicit class has to
+    * be instantiated with a call to the JVM.
+    *
+    * @param df   dataframe to get the relation from
+    * @param name name of the relation
+    * @return new DataFrame with the related data
+    */
+  private[engine] def getRelated(df: DataFrame, name: String): DataFrame =
+    df.getRelated(name)
+
+  /**
+    * Same as [[EngineDataFrame#getReference]], but without wrapping the DataFrame first.
+    * This is only offered for easier usage from Python, where the implicit class has to
+    * be instantiated with a call to the JVM.
+    *
+    * @param df   dataframe to filter
+    * @param name name of the reference to filter by
+    * @return new dataframe with only the given reference rows
+    */
+  private[engine] def getReference(df: DataFrame, name: String): DataFrame =
+    df.getReference(name)
+
+  /**
+    * Same as [[EngineDataFrame#runPipeline]], but without wrapping the DataFrame first.
+    * This is only offered for easier usage from Python, where the implicit class has to
+    * be instantiated with a call to the JVM.
+    *
+    * @param df        dataframe to apply the steps to
+    * @param stepsJson JSON array with the steps to apply
+    * @return new DataFrame with all the steps applied
+    */
+  private[engine] def runPipeline(df: DataFrame, stepsJson: String): DataFrame =
+    df.runPipeline(stepsJson)
+
   /**
     * Returns a [[org.apache.spark.sql.DataFrame]] for the given table using the provided
     * [[org.apache.spark.sql.SparkSession]].
@@ -3,7 +3,7 @@ package tech.sourced.engine.provider
 import java.util.concurrent.ConcurrentHashMap
 
 import org.apache.hadoop.fs.Path
-import org.apache.spark.SparkContext
+import org.apache.spark.{Partitioner, SparkContext}
 import org.apache.spark.input.PortableDataStream
 import org.apache.spark.rdd.RDD
 
@@ -26,12 +26,21 @@ class RepositoryRDDProvider(sc: SparkContext) {
     * Generates an RDD of repositories with their source at the given path.
     * Path may be remote or local.
     *
-    * @param path               Path where the repositories are stored.
-    * @param repositoriesFormat Format of the repositories that are inside the provided path
+    * @param path                 Path where the repositories are stored.
+    * @param repositoriesFormat   Format of the repositories that are inside the provided path
+    * @param targetPartitionBytes Approximate size in bytes of siva files per partition.
+    *                             If it's not positive, the default partitioning is used.
     * @return RDD of repositories
     */
-  def get(path: String, repositoriesFormat: String): RDD[RepositorySource] =
-    rdd.getOrElse(path, RepositoryRDDProvider.generateRDD(sc, path, repositoriesFormat))
+  def get(path: String,
+          repositoriesFormat: String,
+          targetPartitionBytes: Long = 0): RDD[RepositorySource] =
+    rdd.getOrElse(path, RepositoryRDDProvider.generateRDD(
+      sc,
+      path,
+      repositoriesFormat,
+      targetPartitionBytes
+    ))
 }
 
 /**
@@ -64,17 +73,26 @@ object RepositoryRDDProvider {
     * Generates an RDD of [[RepositorySource]] with the repositories at the given path.
     * Allows bucketing of siva files and raw repositories.
     *
-    * @param sc                 Spark Context
-    * @param path               path to get the repositories from
-    * @param repositoriesFormat format of the repositories inside the provided path
+    * @param sc                   Spark Context
+    * @param path                 path to get the repositories from
+    * @param repositoriesFormat   format of the repositories inside the provided path
+    * @param targetPartitionBytes approximate size in bytes of siva files per partition
     * @return generated RDD
     */
   private def generateRDD(sc: SparkContext,
                           path: String,
-                          repositoriesFormat: String): RDD[RepositorySource] = {
+                          repositoriesFormat: String,
+                          targetPartitionBytes: Long): RDD[RepositorySource] = {
     repositoriesFormat match {
       case SivaFormat =>
-        sc.binaryFiles(s"$path/*").flatMap(b => if (b._1.endsWith(".siva")) {
+        val files = sc.binaryFiles(s"$path/*")
+        val partitioned = if (targetPartitionBytes > 0) {
+          files.partitionBy(SivaPartitioner(sc, path, targetPartitionBytes))
+        } else {
+          files
+        }
+
+        partitioned.flatMap(b => if (b._1.endsWith(".siva")) {
           Some(SivaRepository(b._2))
         } else {
           None
@@ -107,6 +125,67 @@ object RepositoryRDDProvider {
 
 }
 
+/**
+  * Partitioner that places the siva files in partitions of about a target amount of bytes.
+  * Siva files can not be split, so a file bigger than that is read in a partition of its own.
+  *
+  * @param partitionByPath index of the partition of every siva file by its path
+  * @param numPartitions   number of partitions
+  */
+private[provider] class SivaPartitioner(partitionByPath: Map[String, Int],
+                                        override val numPartitions: Int) extends Partitioner {
+
+  override def getPartition(key: Any): Int =
+    partitionByPath.getOrElse(SivaPartitioner.normalize(key.toString), {
+      val mod = key.hashCode % numPartitions
+      if (mod < 0) mod + numPartitions else mod
+    })
+
+}
+
+private[provider] object SivaPartitioner {
+
+  /**
+    * Creates a partitioner for the siva files at the given path. The files are packed in
+    * order into partitions until the next file would exceed the target amount of bytes.
+    *
+    * @param sc                   Spark Context
+    * @param path                 path to get the repositories from
+    * @param targetPartitionBytes approximate size in bytes of siva files per partition
+    * @return partitioner
+    */
+  def apply(sc: SparkContext, path: String, targetPartitionBytes: Long): SivaPartitioner = {
+    val glob = new Path(s"$path/*")
+    val fs = glob.getFileSystem(sc.hadoopConfiguration)
+    val files = Option(fs.globStatus(glob)).getOrElse(Array())
+      .flatMap(status =>
+        if (status.isDirectory) fs.listStatus(status.getPath) else Array(status))
+      .filter(status => status.isFile && status.getPath.getName.endsWith(".siva"))
+      .sortBy(_.getPath.toString)
+
+    var partition = 0
+    var partitionBytes = 0L
+    val partitionByPath = files.map(status => {
+      if (partitionBytes > 0 && partitionBytes + status.getLen > targetPartitionBytes) {
+        partition += 1
+        partitionBytes = 0
+      }
+
+      partitionBytes += status.getLen
+      normalize(status.getPath.toString) -> partition
+    }).toMap
+
+    new SivaPartitioner(partitionByPath, partition + 1)
+  }
+
+  /**
+    * Returns the given path without scheme and authority, so the paths given by the file
+    * system and the ones given by binaryFiles can be compared.
+    */
+  private def normalize(path: String): String = new Path(path).toUri.getPath
+
+}
+
 /**
   * RepositorySource is a repository that comes from a certain source.
   */
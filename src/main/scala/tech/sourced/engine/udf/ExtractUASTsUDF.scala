@@ -26,7 +26,7 @@ case object ExtractUASTsUDF extends CustomUDF with ExtractUASTsUDF {
   override val name = "extractUASTs"
 
   override def apply(session: SparkSession): UserDefinedFunction = {
-    val configB = session.sparkContext.broadcast(Bblfsh.getConfig(session))
+    val configB = Bblfsh.getConfigBroadcast(session)
     udf[Seq[Array[Byte]], String, Array[Byte], String]((path, content, lang) =>
       extractUASTs(path, content, lang, configB.value))
   }
@@ -13,7 +13,7 @@ case object QueryXPathUDF extends CustomUDF {
   override val name = "queryXPath"
 
   override def apply(session: SparkSession): UserDefinedFunction = {
-    val configB = session.sparkContext.broadcast(Bblfsh.getConfig(session))
+    val configB = Bblfsh.getConfigBroadcast(session)
     udf[Seq[Array[Byte]], Seq[Array[Byte]], String]((nodes, query) =>
       queryXPath(nodes, query, configB.value))
   }
@@ -26,15 +26,41 @@ case object QueryXPathUDF extends CustomUDF {
         return null
       }
 
-      nodes.map(Node.parseFrom).flatMap(n => {
-        val result = Bblfsh.filter(n, query, config)
-        if (result == null) {
-          None
-        } else {
-          result.toIterator
-        }
-      }).map(_.toByteArray)
+      filterNodes(nodes.map(Node.parseFrom), query, config)
     })
   }
 
+  /**
+    * Performs all the given queries on the given nodes, which are parsed only once.
+    *
+    * @param nodes   binary-encoded nodes to query
+    * @param queries xpath queries
+    * @param config  bblfsh configuration
+    * @return result of every query, in the same order as the queries
+    */
+  def queryXPaths(nodes: Seq[Array[Byte]],
+                  queries: Seq[String],
+                  config: Bblfsh.Config): Seq[Seq[Array[Byte]]] = {
+    timer.time({
+      if (nodes == null) {
+        queries.map(_ => null: Seq[Array[Byte]])
+      } else {
+        val parsed = nodes.map(Node.parseFrom)
+        queries.map(query => filterNodes(parsed, query, config))
+      }
+    })
+  }
+
+  private def filterNodes(nodes: Seq[Node],
+                          query: String,
+                          config: Bblfsh.Config): Seq[Array[Byte]] =
+    nodes.flatMap(n => {
+      val result = Bblfsh.filter(n, query, config)
+      if (result == null) {
+        None
+      } else {
+        result.toIterator
+      }
+    }).map(_.toByteArray)
+
 }
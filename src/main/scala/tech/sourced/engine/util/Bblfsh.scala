@@ -4,6 +4,8 @@ import java.nio.charset.StandardCharsets
 
 import gopkg.in.bblfsh.sdk.v1.protocol.generated.Status
 import gopkg.in.bblfsh.sdk.v1.uast.generated.Node
+import org.apache.spark.SparkContext
+import org.apache.spark.broadcast.Broadcast
 import org.apache.spark.internal.Logging
 import org.apache.spark.sql.SparkSession
 import org.bblfsh.client.BblfshClient
@@ -29,6 +31,8 @@ object Bblfsh extends Logging {
 
   private var config: Config = _
   private var client: BblfshClient = _
+  private var configBroadcast: Broadcast[Config] = _
+  private var configBroadcastContext: SparkContext = _
 
   /**
     * Returns the configuration for bblfsh.
@@ -46,6 +50,23 @@ object Bblfsh extends Logging {
     config
   }
 
+  /**
+    * Returns the configuration for bblfsh broadcasted to the executors. It's only
+    * broadcasted once per Spark context, so repeated queries reuse the same broadcast.
+    *
+    * @param session Spark session
+    * @return broadcasted bblfsh configuration
+    */
+  def getConfigBroadcast(session: SparkSession): Broadcast[Config] = synchronized {
+    val sc = session.sparkContext
+    if (configBroadcast == null || (configBroadcastContext ne sc)) {
+      configBroadcast = sc.broadcast(getConfig(session))
+      configBroadcastContext = sc
+    }
+
+    configBroadcast
+  }
+
   private def getClient(config: Config): BblfshClient = synchronized {
     if (client == null) {
       client = BblfshClient(config.host, config.port)
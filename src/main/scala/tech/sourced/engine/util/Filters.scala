@@ -88,6 +88,11 @@ object Filter {
         values.map({ case Literal(value, _) => transformLiteral(value) })
       ))
 
+    // Spark rewrites IN lists longer than a few values into InSet, so they
+    // must be handled as well to keep large lists pushed down.
+    case InSet(attr: AttributeReference, values) =>
+      Seq(InFilter(new Attr(attr.toAttribute), values.toSeq.map(transformLiteral)))
+
     case And(l, r) => compile(l) ++ compile(r)
 
     case _ => Seq()
@@ -188,7 +193,9 @@ case class InFilter(attr: Attr, vals: Seq[Any]) extends AttrFilter(attr) {
   /**
     * @inheritdoc
     */
-  def eval(value: Any): Boolean = vals.contains(value)
+  def eval(value: Any): Boolean = valueSet.contains(value)
+
+  @transient private lazy val valueSet: Set[Any] = vals.toSet
 
 }
 
@@ -64,6 +64,11 @@ class BaseSourceSpec(source: String = "BaseSourceSpec")
     assert(df.count == 2)
   }
 
+  it should "filter by reference without wrapping the DataFrame" in {
+    val df = getReference(engine.getRepositories.getReferences, "refs/heads/develop")
+    df.count() should be(2)
+  }
+
   "Filter by HEAD reference" should "return only HEAD references" in {
     val spark = ss
     val df = Engine(spark, resourcePath, "siva").getRepositories.getHEAD
@@ -75,6 +80,31 @@ class BaseSourceSpec(source: String = "BaseSourceSpec")
     assert(df.count == 5)
   }
 
+  "getRelated" should "return the DataFrame of the relation with the given name" in {
+    val refsDf = engine.getRepositories.getRelated("references")
+    refsDf.count() should be(engine.getRepositories.getReferences.count())
+    refsDf.getRelated("master_ref").count() should be(5)
+  }
+
+  it should "fail with an unknown relation" in {
+    a[SparkException] should be thrownBy engine.getRepositories.getRelated("foo")
+  }
+
+  it should "be callable without wrapping the DataFrame" in {
+    val reposDf = engine.getRepositories
+    getRelated(reposDf, "references").count() should be(reposDf.getReferences.count())
+  }
+
+  it should "return only HEAD references of the repositories" in {
+    engine.getRepositories.getRelated("head_ref").count() should be(5)
+  }
+
+  it should "return only master references of the repositories" in {
+    val df = engine.getRepositories.getRelated("master_ref")
+    df.count() should be(5)
+    df.filter(df("name") =!= "refs/heads/master").count() should be(0)
+  }
+
   "Get develop commits" should "return only develop commits" in {
     val df = engine.getRepositories
       .getReference("refs/heads/develop").getAllReferenceCommits
@@ -147,6 +177,35 @@ class BaseSourceSpec(source: String = "BaseSourceSpec")
     assert(files.count == 2)
   }
 
+  it should "return the same files if the filters are given as JSON" in {
+    val files = engine
+      .getBlobsFromJson(
+        """["github.com/xiyou-linuxer/faq-xiyoulinux", "github.com/mawag/faq-xiyoulinux"]""",
+        """["refs/heads/HEAD", "refs/heads/develop"]""",
+        "[]"
+      )
+      .drop("repository_id", "reference_name")
+      .distinct()
+    val expected = engine
+      .getBlobs(
+        repositoryIds = List("github.com/xiyou-linuxer/faq-xiyoulinux",
+          "github.com/mawag/faq-xiyoulinux"),
+        referenceNames = List("refs/heads/HEAD", "refs/heads/develop")
+      )
+      .drop("repository_id", "reference_name")
+      .distinct()
+
+    assert(files.count == expected.count)
+  }
+
+  it should "keep empty values given as JSON" in {
+    engine.getBlobsFromJson("""[""]""", "[]", "[]").count() should be(0)
+  }
+
+  it should "fail if the filters given as JSON are not arrays of strings" in {
+    a[SparkException] should be thrownBy engine.getBlobsFromJson("[1]", "[]", "[]")
+  }
+
   override protected def afterEach(): Unit = {
     super.afterEach()
 
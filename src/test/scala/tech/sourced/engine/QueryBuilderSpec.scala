@@ -54,6 +54,8 @@ class QueryBuilderSpec extends FlatSpec with Matchers {
       (In(attr("foo", "bar"), Seq()), s"CASE WHEN $col IS NULL THEN NULL ELSE FALSE END"),
       (In(attr("foo", "bar"), Seq(Literal(1, IntegerType), Literal(2, IntegerType))),
         s"$col IN (1, 2)"),
+      (InSet(attr("foo", "bar"), Set[Any]()), s"CASE WHEN $col IS NULL THEN NULL ELSE FALSE END"),
+      (InSet(attr("foo", "bar"), Set[Any](1)), s"$col IN (1)"),
       (Not(EqualTo(attr("foo", "bar"), Literal(1, IntegerType))),
         s"(NOT ($col = 1))"),
       (Or(EqualTo(attr("foo", "bar"), Literal(1, IntegerType)),
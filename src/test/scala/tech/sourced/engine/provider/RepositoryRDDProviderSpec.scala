@@ -63,6 +63,18 @@ class RepositoryRDDProviderSpec extends FlatSpec with Matchers with BeforeAndAft
     repos.length should be(1)
   }
 
+  it should "read every siva file in its own partition if they exceed the target size" in {
+    val repos = provider.get(resourcePath, "siva", targetPartitionBytes = 1)
+    repos.getNumPartitions should be(3)
+    repos.glom().collect().map(_.length) should be(Array(1, 1, 1))
+  }
+
+  it should "read all siva files in a single partition if they fit in the target size" in {
+    val repos = provider.get(resourcePath, "siva", targetPartitionBytes = Long.MaxValue)
+    repos.getNumPartitions should be(1)
+    repos.collect().length should be(3)
+  }
+
   private def createRepo(path: Path) = {
     val repo = RepoUtils.createRepo(path)
     RepoUtils.commitFile(repo, "file.txt", "something something", "some commit")
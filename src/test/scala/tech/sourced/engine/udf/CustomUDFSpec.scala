@@ -1,9 +1,11 @@
 package tech.sourced.engine.udf
 
 import gopkg.in.bblfsh.sdk.v1.uast.generated.{Node, Role}
+import org.apache.spark.SparkException
 import org.apache.spark.sql.types.{StringType, StructField}
 import org.scalatest.{FlatSpec, Matchers}
 import tech.sourced.engine._
+import tech.sourced.engine.util.Bblfsh
 
 class CustomUDFSpec extends FlatSpec with Matchers with BaseSparkSpec {
 
@@ -81,6 +83,21 @@ class CustomUDFSpec extends FlatSpec with Matchers with BaseSparkSpec {
     }
   }
 
+  "classifyAndExtract" should "add the same columns as classifying and extracting" in {
+    val spark = ss
+    import spark.implicits._
+
+    val df = fileSeq.toDF(fileColumns: _*)
+    val fused = df.classifyAndExtract
+    val expected = df.classifyLanguages.extractUASTs()
+
+    fused.schema should be(expected.schema)
+    fused.select('path, 'lang).collect() should contain theSameElementsAs
+      expected.select('path, 'lang).collect()
+    fused.take(2).foreach(row =>
+      assert(row.getAs[Seq[Array[Byte]]]("uast").nonEmpty))
+  }
+
   "UAST on unsupported language" should "not query bblfsh" in {
     val spark = ss
     import spark.implicits._
@@ -109,6 +126,10 @@ class CustomUDFSpec extends FlatSpec with Matchers with BaseSparkSpec {
     uastsDF.columns should contain("uast")
   }
 
+  "Bblfsh config" should "be broadcasted only once per context" in {
+    Bblfsh.getConfigBroadcast(ss) should be theSameInstanceAs Bblfsh.getConfigBroadcast(ss)
+  }
+
   "QueryXPath" should "query an UAST using xpath" in {
     val spark = ss
     import spark.implicits._
@@ -188,6 +209,31 @@ class CustomUDFSpec extends FlatSpec with Matchers with BaseSparkSpec {
     )
   }
 
+  it should "query using queryUASTs method of dataframe with many queries" in {
+    val spark = ss
+    import spark.implicits._
+
+    val row = fileSeq.take(1).toDF(fileColumns: _*)
+      .classifyLanguages
+      .extractUASTs()
+      .queryUASTs(Seq(
+        "//*[@roleIdentifier and not(@roleIncomplete)]",
+        "//*[@roleIdentifier]"
+      ))
+      .first()
+
+    val identifiers = row.getAs[Seq[Array[Byte]]]("result_0").map(Node.parseFrom).map(_.token)
+    identifiers.length should be(5)
+    identifiers should contain allOf(
+      "contents",
+      "read",
+      "open",
+      "f"
+    )
+
+    row.getAs[Seq[Array[Byte]]]("result_1").length should be >= identifiers.length
+  }
+
   "ExtractTokensUDF" should "extract the tokens in a column" in {
     val spark = ss
     import spark.implicits._
@@ -210,4 +256,59 @@ class CustomUDFSpec extends FlatSpec with Matchers with BaseSparkSpec {
     )
   }
 
+  "runPipeline" should "chain all the given steps" in {
+    val spark = ss
+    import spark.implicits._
+
+    val identifiers = fileSeq.take(1).toDF(fileColumns: _*)
+      .runPipeline(
+        """[
+          |  {"op": "classifyLanguages"},
+          |  {"op": "extractUASTs"},
+          |  {"op": "queryUAST", "query": "//*[@roleIdentifier and not(@roleIncomplete)]"},
+          |  {"op": "extractTokens"}
+          |]""".stripMargin)
+      .collect()
+      .map(row => row(row.fieldIndex("tokens")))
+      .flatMap(_.asInstanceOf[Seq[String]])
+
+    identifiers.length should be(5)
+    identifiers should contain allOf(
+      "contents",
+      "read",
+      "open",
+      "f"
+    )
+  }
+
+  it should "run many queries in a queryUASTs step" in {
+    val spark = ss
+    import spark.implicits._
+
+    val row = fileSeq.take(1).toDF(fileColumns: _*)
+      .runPipeline(
+        """[
+          |  {"op": "extractUASTs"},
+          |  {"op": "queryUASTs", "queries": [
+          |    "//*[@roleIdentifier and not(@roleIncomplete)]",
+          |    "//*[@roleIdentifier]"
+          |  ]}
+          |]""".stripMargin)
+      .first()
+
+    val identifiers = row.getAs[Seq[Array[Byte]]]("result_0").map(Node.parseFrom).map(_.token)
+    identifiers.length should be(5)
+    row.getAs[Seq[Array[Byte]]]("result_1").length should be >= identifiers.length
+  }
+
+  it should "fail with an unknown operation" in {
+    val spark = ss
+    import spark.implicits._
+
+    val df = fileSeq.take(1).toDF(fileColumns: _*)
+    a[SparkException] should be thrownBy df.runPipeline("""[{"op": "foo"}]""")
+    a[SparkException] should be thrownBy df.runPipeline("""{"op": "extractUASTs"}""")
+    a[SparkException] should be thrownBy df.runPipeline("""[{"op": "queryUASTs"}]""")
+  }
+
 }
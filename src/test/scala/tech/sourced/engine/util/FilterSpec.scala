@@ -2,6 +2,7 @@ package tech.sourced.engine.util
 
 import org.apache.spark.sql.catalyst.expressions._
 import org.apache.spark.sql.types.StringType
+import org.apache.spark.unsafe.types.UTF8String
 import org.scalatest.{FlatSpec, Matchers}
 
 class FilterSpec extends FlatSpec with Matchers {
@@ -68,6 +69,17 @@ class FilterSpec extends FlatSpec with Matchers {
     filters.matches(Seq("test3"), "b") should be(true)
   }
 
+  "ColumnFilter" should "process correctly InSet expressions" in {
+    val values = (1 to 20).map(i => UTF8String.fromString(s"v$i")).toSet[Any]
+    val f = Filter.compile(InSet(AttributeReference("test", StringType)(), values))
+
+    f.length should be(1)
+    val filters = Filters(f)
+    filters.matches(Seq("test"), "v1") should be(true)
+    filters.matches(Seq("test"), "v20") should be(true)
+    filters.matches(Seq("test"), "v21") should be(false)
+  }
+
   "ColumnFilter" should "handle correctly unsupported filters" in {
     val f = Filter.compile(StartsWith(AttributeReference("test", StringType)(), Literal("a")))
 